@@ -2,4 +2,19 @@
 
 __all__ = ["Book"]
 
-from xhtml2epub.book import Book
+from typing import TYPE_CHECKING, Type
+
+if TYPE_CHECKING:
+    from xhtml2epub.book import Book
+
+
+def __getattr__(name: str) -> "Type[Book]":
+    # Defer importing ``book`` (and with it lxml and ebooklib) until it's needed,
+    # so that e.g. ``xhtml2epub --help`` starts quickly
+    if name == "Book":
+        from xhtml2epub.book import Book
+
+        globals()["Book"] = Book
+        return Book
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
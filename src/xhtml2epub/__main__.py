@@ -5,12 +5,18 @@ import os
 import shutil
 import sys
 from importlib.metadata import metadata
-from typing import List, Optional
-
-import pkg_resources
+from typing import TYPE_CHECKING, Callable, List, Optional
 
 import xhtml2epub
 
+try:
+    from importlib.resources import as_file, files
+except ImportError:  # Python 3.8
+    as_file = files = None
+
+if TYPE_CHECKING:
+    from importlib.abc import Traversable
+
 _VERSION_MSG = """\
 %(prog)s {version} ({path})
 
@@ -75,14 +81,35 @@ def main(args: Optional[List[str]] = None) -> Optional[int]:
 
 
 def _write_template_dir(destination_dir: str) -> None:
-    source_dir = pkg_resources.resource_filename(__name__, "template")
     print(f"copying template files to {destination_dir!r}")
 
     def copy(src, dest):
         print(f">>> {dest!r}")
         shutil.copy2(src, dest)
 
-    shutil.copytree(source_dir, destination_dir, copy_function=copy)
+    if files:
+        _copy_resource_dir(files(xhtml2epub) / "template", destination_dir, copy)
+    else:
+        source_dir = os.path.join(os.path.dirname(xhtml2epub.__file__), "template")
+        shutil.copytree(source_dir, destination_dir, copy_function=copy)
+
+
+def _copy_resource_dir(
+    source: "Traversable", destination_dir: str, copy: Callable[[str, str], None]
+) -> None:
+    """Copy the package resource directory ``source`` to ``destination_dir``.
+
+    Each file goes through ``as_file``, so this also works when the package isn't
+    installed as plain files (e.g. when it is zipped).
+    """
+    os.makedirs(destination_dir)
+    for entry in source.iterdir():
+        dest = os.path.join(destination_dir, entry.name)
+        if entry.is_dir():
+            _copy_resource_dir(entry, dest, copy)
+        else:
+            with as_file(entry) as src:
+                copy(src, dest)
 
 
 def _convert_ebook(input_file: str, output_file: Optional[str] = None) -> None:
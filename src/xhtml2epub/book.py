@@ -1,8 +1,10 @@
+import functools
 import html
 import json
 import os.path
 import re
 import sys
+from concurrent.futures import Executor, ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Dict, List, NamedTuple, Optional, Tuple, Union
 
@@ -12,6 +14,15 @@ from lxml.etree import Element
 from lxml.etree import _ElementTree as ElementTree
 from lxml.html import HtmlEntity, XHTMLParser
 
+_XHTML_NAMESPACE = "http://www.w3.org/1999/xhtml"
+
+# Number of threads used to read image and stylesheet files concurrently
+_READ_WORKERS = 8
+
+# Named character references defined by HTML5, keyed without the trailing semicolon
+_HTML_ENTITIES = {k.rstrip(";"): v for k, v in html.entities.html5.items()}
+_ENCODED_HTML_ENTITIES = {k.encode(): v.encode() for k, v in _HTML_ENTITIES.items()}
+
 
 @dataclass
 class ChapterContent:
@@ -33,6 +44,9 @@ class ChapterTree:
 class Book:
     """An ebook that can be serialized as EPUB."""
 
+    _ENTITY_RE = re.compile(rb"&(#(x)?)?([A-Za-z0-9]+);")
+    _ID_TITLE_TABLE = str.maketrans("-_", "  ")
+
     def __init__(
         self,
         content: ElementTree,
@@ -68,6 +82,7 @@ class Book:
         :param source: path to the XHTML file to parse
         """
         parser = XHTMLParser(
+            collect_ids=False,
             load_dtd=True,
             remove_blank_text=True,
             resolve_entities=False,
@@ -75,8 +90,10 @@ class Book:
         tree = etree.parse(source, parser)
 
         # Strip the standard XHTML namespace from tags, but leave any others in place
-        for elt in tree.iter(tag=Element):
-            elt.tag = elt.tag.replace("{http://www.w3.org/1999/xhtml}", "")
+        prefix = f"{{{_XHTML_NAMESPACE}}}"
+        prefix_len = len(prefix)
+        for elt in tree.iter(f"{prefix}*"):
+            elt.tag = elt.tag[prefix_len:]
 
         entities = cls._internal_entities(tree)
         return Book(
@@ -96,8 +113,17 @@ class Book:
     def _parse_content(self, content: ElementTree) -> None:
         """Walk the XML DOM and detect book structure."""
         self.content = content
-        self.entities = {k.rstrip(";"): v for k, v in html.entities.html5.items()}
-        self.entities.update(self._internal_entities(content))
+        internal_entities = self._internal_entities(content)
+        self.entities = {**_HTML_ENTITIES, **internal_entities}
+        self._encoded_entities = {
+            **_ENCODED_HTML_ENTITIES,
+            # External entities have no content to expand
+            **{
+                k.encode(): v.encode()
+                for k, v in internal_entities.items()
+                if v is not None
+            },
+        }
 
         self.images, self.cover = self._find_images(content)
         self.stylesheets = self._find_stylesheets(content)
@@ -115,7 +141,7 @@ class Book:
         images = {}
         cover = None
 
-        for img in content.iterfind(".//img"):
+        for img in content.iter("img"):
             source = img.attrib["src"]
             basename = self._basename(source)
             img_id = img.attrib.get("id", f"img.{basename}")
@@ -129,23 +155,35 @@ class Book:
 
         return (images, cover)
 
-    def _basename(self, path: str) -> str:
+    @staticmethod
+    @functools.lru_cache(maxsize=512)
+    def _basename(path: str) -> str:
         """Return a file ``path``'s basename with file extension removed."""
         return os.path.splitext(os.path.basename(path))[0]
 
     def _find_stylesheets(self, content: ElementTree) -> List[Dict[str, str]]:
         """Find all linked stylesheets in the book."""
-        links = content.xpath('//link[@rel="stylesheet"]')
-        return [dict(link.attrib) for link in links]
+        return [
+            dict(link.attrib)
+            for link in content.iter("link")
+            if link.get("rel") == "stylesheet"
+        ]
 
     def _find_chapters(self, element: Element) -> ChapterTree:
         """Find all chapters under ``element``.
 
         A chapter is a ``div`` with the ``id`` attribute set.
         """
-        child_divs = element.xpath("div[@id]")
-        for child in child_divs:
-            element.remove(child)
+        child_divs = [div for div in element.iterchildren("div") if "id" in div.attrib]
+
+        # Detach all child chapters at once; removing them one at a time is
+        # quadratic in the number of siblings
+        if child_divs:
+            element[:] = [
+                child
+                for child in element
+                if not (child.tag == "div" and "id" in child.attrib)
+            ]
 
         chapter = ChapterTree(children=[self._find_chapters(div) for div in child_divs])
         if element.tag == "div":
@@ -169,7 +207,7 @@ class Book:
             if title_parts:
                 title = ": ".join(title_parts)
             else:
-                title = re.sub("[-_]", " ", chapter_id).title()
+                title = chapter_id.translate(self._ID_TITLE_TABLE).title()
 
         return ChapterContent(chapter_id, title, element)
 
@@ -177,11 +215,23 @@ class Book:
         """Extract the text content of ``element`` and its children, expanding entity
         references as needed.
         """
-        if isinstance(element, HtmlEntity):
-            return self.entities[element.name] + (element.tail or "")
-        else:
-            child_texts = [self._text(child) for child in element]
-            return "".join([element.text or "", *child_texts, element.tail or ""])
+        parts = []
+        append = parts.append
+        entities = self.entities
+        events = ("start", "end", "comment", "pi")
+        for event, node in etree.iterwalk(element, events=events):
+            if event == "end":
+                append(node.tail or "")
+            elif event != "start":
+                # Comments and processing instructions have no separate end event
+                append(node.text or "")
+                append(node.tail or "")
+            elif isinstance(node, HtmlEntity):
+                append(entities[node.name])
+            else:
+                append(node.text or "")
+
+        return "".join(parts)
 
     def write(self, dest: str) -> None:
         """Write the book's content to ``dest`` as EPUB."""
@@ -195,8 +245,10 @@ class Book:
         if self.uid:
             book.set_identifier(self.uid)
 
-        self._add_images(book)
-        self._add_stylesheets(book)
+        # Read image and stylesheet files concurrently, sharing one pool of threads
+        with ThreadPoolExecutor(max_workers=_READ_WORKERS) as executor:
+            self._add_images(book, executor)
+            self._add_stylesheets(book, executor)
         self._add_chapters(book)
 
         epub.write_epub(dest, book)
@@ -207,10 +259,12 @@ class Book:
             f"{self.author or 'Unknown Author'} - {self.title or 'Unknown Title'}.epub"
         )
 
-    def _add_images(self, book: epub.EpubBook) -> None:
-        """Add EPUB entries for each image in the book to ``book``."""
-        for img_id, img_src in self.images.items():
-            img_bytes = self._read_book_file(img_src)
+    def _add_images(self, book: epub.EpubBook, executor: Executor) -> None:
+        """Add EPUB entries for each image in the book to ``book``, reading the image
+        files using ``executor``.
+        """
+        img_contents = executor.map(self._read_book_file, self.images.values())
+        for (img_id, img_src), img_bytes in zip(self.images.items(), img_contents):
             if img_id == self.cover:
                 book.set_cover(img_src, img_bytes, create_page=False)
             else:
@@ -219,12 +273,16 @@ class Book:
                 )
                 book.add_item(img_item)
 
-    def _add_stylesheets(self, book: epub.EpubBook) -> None:
-        """Add EPUB entries for all linked stylesheets to ``book``."""
-        for sheet in self.stylesheets:
+    def _add_stylesheets(self, book: epub.EpubBook, executor: Executor) -> None:
+        """Add EPUB entries for all linked stylesheets to ``book``, reading the
+        stylesheet files using ``executor``.
+        """
+        sheet_contents = executor.map(
+            self._read_book_file, [sheet["href"] for sheet in self.stylesheets]
+        )
+        for sheet, sheet_bytes in zip(self.stylesheets, sheet_contents):
             filename = sheet["href"]
             sheet_id = self._basename(filename)
-            sheet_bytes = self._read_book_file(filename)
             sheet_item = epub.EpubItem(
                 uid=sheet_id,
                 file_name=filename,
@@ -246,10 +304,8 @@ class Book:
 
     def _add_chapters(self, book: epub.EpubBook) -> None:
         """Add entries for all chapters to the ``book``'s TOC and spine."""
-        toc = []
         self.spine = []
-        for chapter in self.chapters:
-            toc.append(self._add_chapter(book, chapter))
+        toc = [self._add_chapter(book, chapter) for chapter in self.chapters]
 
         book.toc = toc
         book.spine = self.spine
@@ -271,7 +327,7 @@ class Book:
                 uid=content.id,
                 title=content.title,
                 file_name=f"{content.id}.xhtml",
-                content=self._element_xhtml(content.element),
+                content=self._element_xhtml(element),
             )
             chapter_item.links = self.stylesheets
             book.add_item(chapter_item)
@@ -289,20 +345,19 @@ class Book:
 
     def _element_xhtml(self, element: Element) -> bytes:
         """Serialize ``element`` and its contents as XHTML."""
-        raw_content = etree.tostring(element)
-
-        def expand_entity(match: re.Match) -> bytes:
-            is_num, is_hex, code = match.groups()
-            if is_num:
-                return chr(int(code, base=16 if is_hex else 10)).encode()
-
-            code = code.decode()
-            if code in self.entities:
-                return self.entities[code].encode()
-            else:
-                return match.group()
+        raw_content = etree.tostring(element, encoding="utf-8")
+        # Most chapters contain no references at all; finding that out with a
+        # plain byte search avoids running the regex engine over them
+        if b"&" not in raw_content:
+            return raw_content
+        return self._ENTITY_RE.sub(self._expand_entity, raw_content)
+
+    def _expand_entity(self, match: re.Match) -> bytes:
+        """Return the expansion of the entity reference in ``match``, or the
+        original text if it is not a known entity.
+        """
+        is_num, is_hex, code = match.groups()
+        if is_num:
+            return chr(int(code, base=16 if is_hex else 10)).encode()
 
-        encoded_content = re.sub(
-            b"&(#(x)?)?([A-Za-z0-9]+);", expand_entity, raw_content
-        )
-        return encoded_content
+        return self._encoded_entities.get(code, match.group())